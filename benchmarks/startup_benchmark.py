@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+MCP服务启动耗时基准测试
+在独立子进程中多次导入 main.py，统计到达 mcp.run() 之前的就绪耗时，
+并通过 -X importtime 输出各模块的导入耗时明细
+
+用法:
+    python benchmarks/startup_benchmark.py [--runs 10] [--top 15] [--first-tool]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+from typing import List, Dict, Any, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程中执行：导入main（即创建mcp实例）后输出耗时，可选测量首次工具调用时的组件初始化耗时
+READY_PROBE = """
+import json, time
+start = time.perf_counter()
+import main
+ready = time.perf_counter() - start
+result = {"ready_ms": ready * 1000}
+if %(first_tool)r:
+    start = time.perf_counter()
+    main._get_project_scanner()
+    main._get_content_snapshot()
+    main._generate_ios_rules("", "")
+    result["first_tool_ms"] = (time.perf_counter() - start) * 1000
+print(json.dumps(result))
+"""
+
+
+def run_probe(first_tool: bool, importtime: bool) -> Tuple[Dict[str, Any], str]:
+    """运行一次启动探测，返回耗时结果和importtime输出"""
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', READY_PROBE % {'first_tool': first_tool}]
+
+    completed = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else "启动失败")
+
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """解析 -X importtime 输出为 [{module, self_us, cumulative_us, depth}]"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append({
+            'module': name.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': depth
+        })
+    return entries
+
+
+def summarize_imports(entries: List[Dict[str, Any]], top: int) -> Dict[str, Any]:
+    """按顶层包汇总导入耗时，并列出自身耗时最高的模块"""
+    by_package = defaultdict(int)
+    for entry in entries:
+        by_package[entry['module'].split('.')[0]] += entry['self_us']
+
+    total_us = sum(by_package.values())
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    modules = sorted(entries, key=lambda entry: entry['self_us'], reverse=True)[:top]
+
+    return {
+        'total_import_ms': round(total_us / 1000, 2),
+        'by_package': [
+            {'package': name, 'self_ms': round(us / 1000, 2), 'share': f"{us / total_us * 100:.1f}%" if total_us else "0%"}
+            for name, us in packages
+        ],
+        'slowest_modules': [
+            {'module': entry['module'], 'self_ms': round(entry['self_us'] / 1000, 2),
+             'cumulative_ms': round(entry['cumulative_us'] / 1000, 2)}
+            for entry in modules
+        ],
+        'project_modules_loaded': sorted(e['module'] for e in entries
+                                         if e['module'] == 'main' or e['module'].startswith('src'))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量MCP服务启动耗时")
+    parser.add_argument('--runs', type=int, default=10, help="测量次数")
+    parser.add_argument('--top', type=int, default=15, help="导入明细显示条数")
+    parser.add_argument('--first-tool', action='store_true', help="同时测量首次工具调用的组件初始化耗时")
+    args = parser.parse_args()
+
+    # 预热一次，排除首次编译 .pyc 的开销
+    run_probe(args.first_tool, importtime=False)
+
+    ready = []
+    first_tool = []
+    for _ in range(max(1, args.runs)):
+        result, _ = run_probe(args.first_tool, importtime=False)
+        ready.append(result['ready_ms'])
+        if 'first_tool_ms' in result:
+            first_tool.append(result['first_tool_ms'])
+
+    _, importtime_output = run_probe(False, importtime=True)
+
+    report = {
+        'python': sys.version.split()[0],
+        'runs': len(ready),
+        'ready_ms': {
+            'min': round(min(ready), 2),
+            'median': round(statistics.median(ready), 2),
+            'max': round(max(ready), 2)
+        },
+        'imports': summarize_imports(parse_importtime(importtime_output), args.top)
+    }
+    if first_tool:
+        report['first_tool_ms'] = {
+            'min': round(min(first_tool), 2),
+            'median': round(statistics.median(first_tool), 2),
+            'max': round(max(first_tool), 2)
+        }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
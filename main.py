@@ -7,25 +7,81 @@ iOS Migration MCP Server 主启动文件
 from fastmcp import FastMCP
 import json
 import os
+import glob
 import shutil
-from typing import List, Dict, Any
+import hashlib
+import threading
+from functools import lru_cache
+from typing import List, Dict, Any, TYPE_CHECKING
 from datetime import datetime
 from pathlib import Path
 
-from src.analyzers.project_scanner import ProjectScanner
-from src.analyzers.file_analyzer import FileAnalyzer
+from src.analyzers.record_store import record_lock, atomic_write, write_json_atomic
+
+if TYPE_CHECKING:
+    from src.analyzers.project_scanner import ProjectScanner
+    from src.analyzers.file_analyzer import FileAnalyzer
+    from src.analyzers.project_watcher import ProjectWatcher
+    from src.analyzers.work_queue import WorkQueue
+    from src.analyzers.content_snapshot import ContentSnapshot
 
 # 创建FastMCP服务器实例
 mcp = FastMCP("iOS Migration Analyzer")
 
-# 创建功能组件
-project_scanner = ProjectScanner()
-file_analyzer = FileAnalyzer()
+# 功能组件在工具首次调用时才导入和创建，缩短服务启动时间
+_components: Dict[str, Any] = {}
+_components_lock = threading.Lock()
+
+# 项目实时监听器（按项目绝对路径索引）
+project_watchers: Dict[str, "ProjectWatcher"] = {}
+MAX_PROJECT_WATCHERS = 4
+
+# 改造工作队列（按项目绝对路径索引）
+work_queues: Dict[str, "WorkQueue"] = {}
+
+def _get_component(name: str, factory):
+    """获取功能组件，首次调用时创建"""
+    component = _components.get(name)
+    if component is None:
+        with _components_lock:
+            component = _components.get(name)
+            if component is None:
+                component = factory()
+                _components[name] = component
+    return component
+
+def _get_project_scanner() -> "ProjectScanner":
+    def factory():
+        from src.analyzers.project_scanner import ProjectScanner
+        return ProjectScanner()
+    return _get_component("project_scanner", factory)
+
+def _get_file_analyzer() -> "FileAnalyzer":
+    def factory():
+        from src.analyzers.file_analyzer import FileAnalyzer
+        return FileAnalyzer()
+    return _get_component("file_analyzer", factory)
+
+def _get_content_snapshot() -> "ContentSnapshot":
+    def factory():
+        from src.analyzers.content_snapshot import ContentSnapshot
+        return ContentSnapshot()
+    return _get_component("content_snapshot", factory)
+
+# iOS代码规范模板版本，修改 _render_ios_rules 模板内容时需要递增
+IOS_RULES_TEMPLATE_VERSION = "1"
 
 @mcp.tool()
 def ios_scan_project(
     project_path: str,
-    include_tests: bool = False
+    include_tests: bool = False,
+    reset_baseline: bool = False,
+    analyzer_stages: List[str] = None,
+    resource_limited: bool = False,
+    max_workers: int = 2,
+    max_open_files: int = 4,
+    max_read_bytes_per_sec: int = 8 * 1024 * 1024,
+    low_priority: bool = True
 ) -> str:
     """
     扫描iOS项目，返回简单的文件列表
@@ -33,24 +89,58 @@ def ios_scan_project(
     Args:
         project_path: iOS项目根目录路径
         include_tests: 是否包含测试文件
+        reset_baseline: 是否重新记录文件内容基线（默认仅在基线不存在时记录）
+        analyzer_stages: 额外启用的分析阶段，可选 declarations/complexity/api_usage
+        resource_limited: 是否启用资源受限扫描（适用于与编译任务共享的构建机）
+        max_workers: 资源受限模式下的分析线程数
+        max_open_files: 资源受限模式下同时打开的文件数上限
+        max_read_bytes_per_sec: 资源受限模式下的读取速率上限（字节/秒，0为不限速）
+        low_priority: 资源受限模式下是否降低扫描线程的CPU/IO优先级
     
     Returns:
         JSON格式的项目扫描结果
     """
     try:
+        # 校验分析阶段
+        _get_file_analyzer().get_pipeline(analyzer_stages)
+        
         # 创建记录目录
         record_dir = _create_record_directory(project_path)
         
-        # 扫描项目
-        scan_result = project_scanner.scan_project(project_path, include_tests)
+        # 扫描项目（监听中的项目直接使用实时缓存；附加分析阶段和资源受限扫描需要实际扫描，不使用缓存）
+        governor = None
+        use_watch_cache = not analyzer_stages and not resource_limited
+        watcher = _get_active_watcher(project_path, include_tests) if use_watch_cache else None
+        if watcher is not None:
+            scan_result = watcher.get_scan_result()
+            scan_result['watch_cache'] = True
+        else:
+            if resource_limited:
+                from src.analyzers.resource_governor import ResourceGovernor
+                governor = ResourceGovernor(
+                    max_workers=max_workers,
+                    max_open_files=max_open_files,
+                    max_read_bytes_per_sec=max(0, max_read_bytes_per_sec),
+                    low_priority=low_priority
+                )
+            scan_result = _get_project_scanner().scan_project(project_path, include_tests, analyzer_stages, governor)
+        
+        # 记录文件内容基线，用于之后自动识别被改造的文件；扫描失败或没有文件时不写入，避免空基线挡住之后的扫描
+        content_snapshot = _get_content_snapshot()
+        scan_succeeded = 'error' not in scan_result and bool(scan_result.get('files'))
+        if scan_succeeded and (reset_baseline or not content_snapshot.has_baseline(project_path)):
+            file_paths = [os.path.abspath(file_info['path']) for file_info in scan_result.get('files', [])]
+            scan_result['baseline_info'] = content_snapshot.create_baseline(project_path, file_paths, include_tests, governor)
+            if governor is not None:
+                scan_result['resource_limits'] = governor.report()
         
         # 初始化进度跟踪
         progress_data = _initialize_progress_tracking(scan_result)
         
         # 保存进度跟踪文件（统一命名，覆盖旧文件）
         progress_file = os.path.join(record_dir, "transformation_progress.json")
-        with open(progress_file, 'w', encoding='utf-8') as f:
-            json.dump(progress_data, f, indent=2, ensure_ascii=False)
+        with record_lock(record_dir):
+            write_json_atomic(progress_file, progress_data)
         
         # 添加记录信息到结果
         scan_result['record_info'] = {
@@ -63,6 +153,13 @@ def ios_scan_project(
     except Exception as e:
         return json.dumps({"error": str(e)}, ensure_ascii=False)
 
+def _get_active_watcher(project_path: str, include_tests: bool = False):
+    """获取项目正在运行且配置匹配的监听器"""
+    watcher = project_watchers.get(os.path.abspath(project_path))
+    if watcher is not None and watcher.running and watcher.include_tests == include_tests:
+        return watcher
+    return None
+
 def _initialize_progress_tracking(scan_result: Dict) -> Dict[str, Any]:
     """初始化简化的改造进度跟踪数据"""
     files = scan_result.get('files', [])
@@ -122,12 +219,16 @@ def ios_setup_cursor_rules(
         current_dir = os.path.dirname(os.path.abspath(__file__))
         cursorrules_dir = os.path.join(current_dir, "cursorrules")
         
+        # 内容未变化的文件跳过写入
+        unchanged_files = []
+        
         # 注入优化策略规则
         if include_optimization_strategies:
             source_file = os.path.join(cursorrules_dir, "cursor_optimization_strategies.mdc")
             if os.path.exists(source_file):
                 dest_file = os.path.join(cursor_rules_dir, "cursor_optimization_strategies.mdc")
-                shutil.copy2(source_file, dest_file)
+                if not _copy_if_changed(source_file, dest_file):
+                    unchanged_files.append("cursor_optimization_strategies.mdc")
                 injected_files.append("cursor_optimization_strategies.mdc")
         
         # 注入代码创建规则
@@ -135,14 +236,15 @@ def ios_setup_cursor_rules(
             source_file = os.path.join(cursorrules_dir, "creater_new_code_file.mdc")
             if os.path.exists(source_file):
                 dest_file = os.path.join(cursor_rules_dir, "creater_new_code_file.mdc")
-                shutil.copy2(source_file, dest_file)
+                if not _copy_if_changed(source_file, dest_file):
+                    unchanged_files.append("creater_new_code_file.mdc")
                 injected_files.append("creater_new_code_file.mdc")
         
         # 动态生成iOS代码规范文件（基于目标项目信息和主题）
         ios_rules_content = _generate_ios_rules(project_path, app_theme)
         ios_rules_file = os.path.join(cursor_rules_dir, "iOS_Code_Rules.mdc")
-        with open(ios_rules_file, 'w', encoding='utf-8') as f:
-            f.write(ios_rules_content)
+        if not _write_if_changed(ios_rules_file, ios_rules_content.encode('utf-8')):
+            unchanged_files.append("iOS_Code_Rules.mdc")
         injected_files.append("iOS_Code_Rules.mdc")
         
         # 记录注入操作（统一命名，覆盖旧文件）
@@ -159,8 +261,8 @@ def ios_setup_cursor_rules(
         }
         
         record_file = os.path.join(record_dir, "cursor_rules_injection.json")
-        with open(record_file, 'w', encoding='utf-8') as f:
-            json.dump(injection_record, f, indent=2, ensure_ascii=False)
+        with record_lock(record_dir):
+            write_json_atomic(record_file, injection_record)
         
         result = {
             "success": True,
@@ -170,6 +272,7 @@ def ios_setup_cursor_rules(
             "cursor_rules_directory": cursor_rules_dir,
             "app_theme": app_theme if app_theme else "未指定",
             "injected_files": injected_files,
+            "unchanged_files": unchanged_files,
             "total_files": len(injected_files),
             "record_file": record_file,
             "cursor_commands": {
@@ -211,58 +314,59 @@ def ios_update_progress(
         record_dir = _create_record_directory(project_path)
         progress_file = os.path.join(record_dir, "transformation_progress.json")
         
-        # 读取现有进度
-        if os.path.exists(progress_file):
-            with open(progress_file, 'r', encoding='utf-8') as f:
-                progress_data = json.load(f)
-        else:
-            return json.dumps({"error": "进度文件不存在，请先运行项目扫描"}, ensure_ascii=False)
-        
-        # 更新进度数据
-        timestamp = datetime.now().isoformat()
-        
-        # 验证文件是否存在于项目中
-        valid_files = []
-        invalid_files = []
-        for file_path in completed_files:
-            full_path = os.path.join(project_path, file_path)
-            if os.path.exists(full_path):
-                valid_files.append(file_path)
+        # 读取、更新、保存进度需在同一把锁内完成，避免与监听线程互相覆盖
+        with record_lock(record_dir):
+            # 读取现有进度
+            if os.path.exists(progress_file):
+                with open(progress_file, 'r', encoding='utf-8') as f:
+                    progress_data = json.load(f)
             else:
-                invalid_files.append(file_path)
+                return json.dumps({"error": "进度文件不存在，请先运行项目扫描"}, ensure_ascii=False)
         
-        # 更新进度统计
-        total_files = progress_data.get("project_info", {}).get("total_files", 0)
-        completed_count = len(valid_files)
+            # 更新进度数据
+            timestamp = datetime.now().isoformat()
         
-        progress_data["transformation_progress"] = {
-            "completed": completed_count,
-            "not_started": max(0, total_files - completed_count),
-            "completion_rate": round(completed_count / total_files * 100, 2) if total_files > 0 else 0
-        }
+            # 验证文件是否存在于项目中
+            valid_files = []
+            invalid_files = []
+            for file_path in completed_files:
+                full_path = os.path.join(project_path, file_path)
+                if os.path.exists(full_path):
+                    valid_files.append(file_path)
+                else:
+                    invalid_files.append(file_path)
         
-        # 添加本次更新记录
-        if "update_history" not in progress_data:
-            progress_data["update_history"] = []
-        
-        update_record = {
-            "timestamp": timestamp,
-            "completed_files": valid_files,
-            "notes": notes,
-            "invalid_files": invalid_files,
-            "session_stats": {
-                "files_updated": len(valid_files),
-                "total_completed": completed_count,
-                "completion_rate": progress_data["transformation_progress"]["completion_rate"]
+            # 更新进度统计
+            total_files = progress_data.get("project_info", {}).get("total_files", 0)
+            completed_count = len(valid_files)
+        
+            progress_data["transformation_progress"] = {
+                "completed": completed_count,
+                "not_started": max(0, total_files - completed_count),
+                "completion_rate": round(completed_count / total_files * 100, 2) if total_files > 0 else 0
             }
-        }
         
-        progress_data["update_history"].append(update_record)
-        progress_data["last_update"] = timestamp
+            # 添加本次更新记录
+            if "update_history" not in progress_data:
+                progress_data["update_history"] = []
+        
+            update_record = {
+                "timestamp": timestamp,
+                "completed_files": valid_files,
+                "notes": notes,
+                "invalid_files": invalid_files,
+                "session_stats": {
+                    "files_updated": len(valid_files),
+                    "total_completed": completed_count,
+                    "completion_rate": progress_data["transformation_progress"]["completion_rate"]
+                }
+            }
         
-        # 保存更新后的进度
-        with open(progress_file, 'w', encoding='utf-8') as f:
-            json.dump(progress_data, f, indent=2, ensure_ascii=False)
+            progress_data["update_history"].append(update_record)
+            progress_data["last_update"] = timestamp
+        
+            # 保存更新后的进度
+            write_json_atomic(progress_file, progress_data)
         
         # 生成统计报告
         result = {
@@ -308,6 +412,53 @@ def _get_next_recommendations(progress_data: Dict, project_path: str) -> List[st
     
     return recommendations
 
+@mcp.tool()
+def ios_detect_modified_files(
+    project_path: str,
+    mark_completed: bool = False,
+    verify_content: bool = False,
+    include_untouched: bool = False,
+    notes: str = ""
+) -> str:
+    """
+    与扫描时记录的内容基线比对，识别实际被修改、新增和未改动的文件
+    
+    Args:
+        project_path: 项目根目录路径
+        mark_completed: 是否将被修改的文件自动标记为已完成
+        verify_content: 是否对所有文件重新计算哈希（默认跳过大小和修改时间未变的文件）
+        include_untouched: 是否返回未改动文件列表
+        notes: 自动标记完成时的改造备注
+    
+    Returns:
+        JSON格式的比对结果
+    """
+    try:
+        content_snapshot = _get_content_snapshot()
+        if not content_snapshot.has_baseline(project_path):
+            return json.dumps({"error": "内容基线不存在，请先扫描项目"}, ensure_ascii=False)
+        
+        include_tests = content_snapshot.load_baseline(project_path).get("include_tests", False)
+        file_paths = list(_get_project_scanner().iter_code_files(project_path, include_tests))
+        result = content_snapshot.compare(project_path, file_paths, verify_content)
+        
+        untouched = result.pop("untouched")
+        result["untouched_count"] = len(untouched)
+        if include_untouched:
+            result["untouched"] = untouched
+        
+        if mark_completed and result["modified"]:
+            progress_result = json.loads(ios_update_progress(
+                project_path,
+                result["modified"],
+                notes or f"自动检测到 {len(result['modified'])} 个已修改文件"
+            ))
+            result["progress_update"] = progress_result.get("progress_summary", progress_result)
+        
+        return json.dumps(result, indent=2, ensure_ascii=False)
+    except Exception as e:
+        return json.dumps({"error": f"检测文件改动失败: {str(e)}"}, ensure_ascii=False)
+
 @mcp.tool()
 def ios_get_progress_statistics(
     project_path: str
@@ -366,7 +517,8 @@ def ios_get_progress_statistics(
 @mcp.tool()
 def ios_analyze_file(
     file_path: str,
-    file_content: str
+    file_content: str,
+    analyzer_stages: List[str] = None
 ) -> str:
     """
     分析单个iOS代码文件的基本信息
@@ -374,17 +526,130 @@ def ios_analyze_file(
     Args:
         file_path: 文件路径
         file_content: 文件内容
+        analyzer_stages: 额外启用的分析阶段，可选 declarations/complexity/api_usage
     
     Returns:
         JSON格式的文件分析结果
     """
     try:
-        analysis = file_analyzer.analyze_file(file_path, file_content)
+        file_analyzer = _get_file_analyzer()
+        file_analyzer.get_pipeline(analyzer_stages)
+        analysis = file_analyzer.analyze_file(file_path, file_content, analyzer_stages)
         return json.dumps(analysis, indent=2, ensure_ascii=False)
     except Exception as e:
         return json.dumps({"error": str(e)}, ensure_ascii=False)
 
 
+@mcp.tool()
+def ios_analyze_files(
+    project_path: str,
+    paths: List[str],
+    max_files: int = 500,
+    analyzer_stages: List[str] = None
+) -> str:
+    """
+    在服务端批量读取并分析项目中的多个文件（支持glob通配符），未变化的文件复用缓存
+    
+    Args:
+        project_path: iOS项目根目录路径
+        paths: 相对于项目根目录的文件路径或glob模式列表，如 ["App/**/*.swift"]
+        max_files: 单次最多分析的文件数量
+        analyzer_stages: 额外启用的分析阶段，可选 declarations/complexity/api_usage
+    
+    Returns:
+        JSON格式的精简分析结果
+    """
+    try:
+        if not os.path.isdir(project_path):
+            return json.dumps({"error": f"项目路径不存在: {project_path}"}, ensure_ascii=False)
+        
+        project_scanner = _get_project_scanner()
+        project_scanner.file_analyzer.get_pipeline(analyzer_stages)
+        
+        file_paths, unmatched, truncated = _resolve_project_files(project_path, paths, max(1, max_files))
+        # 解析出的文件路径已展开符号链接，相对路径也需基于展开后的项目根目录计算
+        project_root = os.path.realpath(project_path)
+        
+        hits_before = project_scanner.analysis_cache.hits
+        analyses = project_scanner.analyze_paths(file_paths, stages=analyzer_stages)
+        cache_hits = project_scanner.analysis_cache.hits - hits_before
+        
+        files = []
+        for file_path, analysis in zip(file_paths, analyses):
+            item = {
+                "path": os.path.relpath(file_path, project_root),
+                "lines": analysis.get('line_count', 0),
+                "size": analysis.get('file_size', 'unknown'),
+                "sensitive": analysis.get('has_sensitive_content', True)
+            }
+            for stage in analyzer_stages or []:
+                if stage in analysis:
+                    item[stage] = analysis[stage]
+            if 'error' in analysis:
+                item["error"] = analysis['error']
+            files.append(item)
+        
+        result = {
+            "project_path": project_path,
+            "total_files": len(files),
+            "total_lines": sum(item["lines"] for item in files),
+            "sensitive_files": sum(1 for item in files if item["sensitive"]),
+            "cache_hits": cache_hits,
+            "truncated": truncated,
+            "unmatched": unmatched,
+            "files": files
+        }
+        
+        return json.dumps(result, ensure_ascii=False, separators=(',', ':'))
+    except Exception as e:
+        return json.dumps({"error": f"批量分析失败: {str(e)}"}, ensure_ascii=False)
+
+def _resolve_project_files(project_path: str, patterns: List[str], max_files: int):
+    """
+    将相对路径/glob模式解析为项目内的代码文件列表
+    
+    普通路径和glob匹配结果使用与项目扫描相同的目录和文件过滤规则（测试文件除外），
+    Pods、build等依赖和构建目录中的文件以及非代码文件都不会被读取
+    """
+    project_root = os.path.realpath(project_path)
+    project_scanner = _get_project_scanner()
+    resolved = []
+    seen = set()
+    unmatched = []
+    truncated = False
+    
+    for pattern in patterns:
+        if os.path.isabs(pattern):
+            unmatched.append(pattern)
+            continue
+        
+        full_pattern = os.path.join(project_root, pattern)
+        if glob.has_magic(pattern):
+            matches = sorted(glob.iglob(full_pattern, recursive=True))
+        else:
+            matches = [full_pattern]
+        
+        matched = False
+        for match in matches:
+            real_path = os.path.realpath(match)
+            # 只允许访问项目目录内的文件
+            if not os.path.isfile(real_path) or os.path.commonpath([project_root, real_path]) != project_root:
+                continue
+            if not project_scanner.is_code_path(os.path.relpath(real_path, project_root), include_tests=True):
+                continue
+            matched = True
+            if real_path in seen:
+                continue
+            if len(resolved) >= max_files:
+                truncated = True
+                break
+            seen.add(real_path)
+            resolved.append(real_path)
+        
+        if not matched:
+            unmatched.append(pattern)
+    
+    return resolved, unmatched, truncated
 
 @mcp.tool()
 def ios_generate_cursor_instructions(
@@ -406,33 +671,217 @@ def ios_generate_cursor_instructions(
         if not os.path.exists(file_path):
             return json.dumps({"error": f"文件不存在: {file_path}"}, ensure_ascii=False)
         
-        # 读取并分析文件
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        # 文件未变化时直接复用已生成的指令
+        stat = os.stat(file_path)
+        return _build_cursor_instructions(file_path, stat.st_mtime_ns, stat.st_size, strategy)
+        
+    except Exception as e:
+        return json.dumps({"error": f"生成指令失败: {str(e)}"}, ensure_ascii=False)
+
+
+
+@mcp.tool()
+def ios_start_watch(
+    project_path: str,
+    include_tests: bool = False,
+    poll_interval: float = 2.0,
+    max_files: int = 50000
+) -> str:
+    """
+    启动项目实时监听，文件变更后自动更新扫描结果和记录文件
+    
+    Args:
+        project_path: iOS项目根目录路径
+        include_tests: 是否包含测试文件
+        poll_interval: 轮询模式下的检查间隔（秒）
+        max_files: 最多跟踪的文件数量
+    
+    Returns:
+        JSON格式的监听状态
+    """
+    try:
+        if not os.path.isdir(project_path):
+            return json.dumps({"error": f"项目路径不存在: {project_path}"}, ensure_ascii=False)
+        
+        key = os.path.abspath(project_path)
+        watcher = project_watchers.get(key)
+        if watcher is not None and watcher.running:
+            if watcher.include_tests == include_tests:
+                return json.dumps({"success": True, "already_running": True, **watcher.status()}, indent=2, ensure_ascii=False)
+            watcher.stop()
         
-        analysis = file_analyzer.analyze_file(file_path, content)
+        project_watchers.pop(key, None)
+        if len(project_watchers) >= MAX_PROJECT_WATCHERS:
+            return json.dumps({"error": f"同时监听的项目数已达上限 {MAX_PROJECT_WATCHERS}，请先停止其他监听"}, ensure_ascii=False)
         
-        # 生成简单指令
-        instructions = {
-            "step_1": "分析文件结构，识别可以安全插入新代码的位置",
-            "step_2": "设计辅助功能，包含UIKit、Foundation、GCD使用",
-            "step_3": "在合适位置插入新代码调用，不破坏原有逻辑",
-            "step_4": "验证新代码被100%调用且编译正常"
-        }
+        _create_record_directory(project_path)
+        from src.analyzers.project_watcher import ProjectWatcher
+        watcher = ProjectWatcher(
+            _get_project_scanner(),
+            project_path,
+            include_tests=include_tests,
+            poll_interval=max(0.5, poll_interval),
+            max_files=max(1, max_files)
+        )
+        watcher.start()
+        project_watchers[key] = watcher
+        
+        return json.dumps({"success": True, **watcher.status()}, indent=2, ensure_ascii=False)
+    except Exception as e:
+        return json.dumps({"error": f"启动监听失败: {str(e)}"}, ensure_ascii=False)
+
+@mcp.tool()
+def ios_stop_watch(
+    project_path: str
+) -> str:
+    """
+    停止项目实时监听
+    
+    Args:
+        project_path: iOS项目根目录路径
+    
+    Returns:
+        JSON格式的停止结果
+    """
+    try:
+        watcher = project_watchers.pop(os.path.abspath(project_path), None)
+        if watcher is None:
+            return json.dumps({"error": f"项目未在监听中: {project_path}"}, ensure_ascii=False)
+        
+        watcher.stop()
+        return json.dumps({"success": True, **watcher.status()}, indent=2, ensure_ascii=False)
+    except Exception as e:
+        return json.dumps({"error": f"停止监听失败: {str(e)}"}, ensure_ascii=False)
+
+@mcp.tool()
+def ios_watch_status(
+    project_path: str = ""
+) -> str:
+    """
+    查看项目实时监听状态
+    
+    Args:
+        project_path: iOS项目根目录路径（为空时返回所有监听）
+    
+    Returns:
+        JSON格式的监听状态
+    """
+    try:
+        if project_path:
+            watcher = project_watchers.get(os.path.abspath(project_path))
+            if watcher is None:
+                return json.dumps({"project_path": project_path, "running": False}, indent=2, ensure_ascii=False)
+            return json.dumps(watcher.status(), indent=2, ensure_ascii=False)
         
         result = {
-            "file_path": file_path,
-            "analysis": analysis,
-            "strategy": strategy,
-            "cursor_instructions": instructions
+            "total_watchers": len(project_watchers),
+            "max_watchers": MAX_PROJECT_WATCHERS,
+            "watchers": [watcher.status() for watcher in project_watchers.values()]
         }
-        
         return json.dumps(result, indent=2, ensure_ascii=False)
+    except Exception as e:
+        return json.dumps({"error": str(e)}, ensure_ascii=False)
+
+@lru_cache(maxsize=512)
+def _build_cursor_instructions(file_path: str, mtime_ns: int, size: int, strategy: str) -> str:
+    """读取并分析文件生成改造指令（按路径、修改时间、大小和策略缓存）"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    analysis = _get_file_analyzer().analyze_file(file_path, content)
+    
+    # 生成简单指令
+    instructions = {
+        "step_1": "分析文件结构，识别可以安全插入新代码的位置",
+        "step_2": "设计辅助功能，包含UIKit、Foundation、GCD使用",
+        "step_3": "在合适位置插入新代码调用，不破坏原有逻辑",
+        "step_4": "验证新代码被100%调用且编译正常"
+    }
+    
+    result = {
+        "file_path": file_path,
+        "analysis": analysis,
+        "strategy": strategy,
+        "cursor_instructions": instructions
+    }
+    
+    return json.dumps(result, indent=2, ensure_ascii=False)
+
+@mcp.tool()
+def ios_next_files(
+    project_path: str,
+    count: int = 5,
+    agent_id: str = "",
+    ranking: List[str] = None,
+    lease_seconds: int = 1800,
+    claim: bool = True
+) -> str:
+    """
+    获取下一批待改造的文件（按优先级排序，并为当前agent认领租约）
+    
+    Args:
+        project_path: 项目根目录路径
+        count: 返回的文件数量
+        agent_id: 认领文件的agent标识（claim为True时必填），租约期内其他agent不会拿到相同文件
+        ranking: 排序键列表，可选 sensitive/size/lines/directory/path，前缀"-"表示降序，默认 ["sensitive", "size", "lines"]
+        lease_seconds: 租约时长（秒）
+        claim: 是否认领返回的文件（False时仅预览）
+    
+    Returns:
+        JSON格式的待改造文件列表
+    """
+    try:
+        if not os.path.isdir(project_path):
+            return json.dumps({"error": f"项目路径不存在: {project_path}"}, ensure_ascii=False)
         
+        result = _get_work_queue(project_path).next_files(
+            count=max(1, count),
+            agent_id=agent_id,
+            lease_seconds=max(1, lease_seconds),
+            ranking=ranking,
+            claim=claim
+        )
+        return json.dumps(result, indent=2, ensure_ascii=False)
+    except FileNotFoundError as e:
+        return json.dumps({"error": str(e)}, ensure_ascii=False)
     except Exception as e:
-        return json.dumps({"error": f"生成指令失败: {str(e)}"}, ensure_ascii=False)
+        return json.dumps({"error": f"获取待改造文件失败: {str(e)}"}, ensure_ascii=False)
 
+@mcp.tool()
+def ios_release_files(
+    project_path: str,
+    files: List[str] = None,
+    agent_id: str = "",
+    force: bool = False
+) -> str:
+    """
+    释放已认领文件的租约
+    
+    Args:
+        project_path: 项目根目录路径
+        files: 要释放的文件列表（为空时释放该agent认领的全部文件）
+        agent_id: 认领文件的agent标识，只能释放自己认领的文件
+        force: 是否强制释放其他agent认领的文件
+    
+    Returns:
+        JSON格式的释放结果
+    """
+    try:
+        if not os.path.isdir(project_path):
+            return json.dumps({"error": f"项目路径不存在: {project_path}"}, ensure_ascii=False)
+
+        result = _get_work_queue(project_path).release(files or [], agent_id, force)
+        return json.dumps({"success": True, **result}, indent=2, ensure_ascii=False)
+    except Exception as e:
+        return json.dumps({"error": f"释放租约失败: {str(e)}"}, ensure_ascii=False)
 
+def _get_work_queue(project_path: str) -> "WorkQueue":
+    """获取项目的工作队列（索引在进程内复用）"""
+    from src.analyzers.work_queue import WorkQueue
+    key = os.path.abspath(project_path)
+    if key not in work_queues:
+        work_queues[key] = WorkQueue(key)
+    return work_queues[key]
 
 def _create_record_directory(project_path: str) -> str:
     """创建记录目录"""
@@ -451,6 +900,8 @@ def _create_record_directory(project_path: str) -> str:
 - `latest_scan_result.json` - 最新项目扫描结果记录
 - `transformation_progress.json` - 改造进度跟踪文件
 - `cursor_rules_injection.json` - Cursor规则注入记录
+- `work_queue.json` - 待改造文件的认领租约记录
+- `baseline_snapshot.json` - 扫描时记录的文件内容基线（大小、修改时间、内容哈希）
 - `README.md` - 本说明文件
 
 ## MCP工具功能
@@ -477,35 +928,46 @@ def _create_record_directory(project_path: str) -> str:
 
 注意：请不要手动删除或修改这些记录文件
 """
-        with open(readme_file, 'w', encoding='utf-8') as f:
-            f.write(readme_content)
+        with record_lock(record_dir):
+            atomic_write(readme_file, readme_content)
     
     return record_dir
 
-def _generate_ios_rules(project_path: str, app_theme: str = "") -> str:
-    """动态生成iOS代码规范文件内容，结合App主题生成相关规则"""
-    
-    # 生成主题提示
-    theme_guidance = ""
-    if app_theme:
-        theme_guidance = f"""
-## 主题导向改造指引
+def _file_digest(file_path: str) -> str:
+    """计算文件内容的SHA-256"""
+    stat = os.stat(file_path)
+    return _cached_file_digest(file_path, stat.st_mtime_ns, stat.st_size)
 
-**应用主题**: {app_theme}
+@lru_cache(maxsize=64)
+def _cached_file_digest(file_path: str, mtime_ns: int, size: int) -> str:
+    """按路径、修改时间和大小缓存文件摘要"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-**代码生成要求**:
-- 所有新增代码应围绕"{app_theme}"主题进行设计
-- 新增功能、类名、方法名应与主题相关
-- 生成的业务逻辑应符合应用的特点
-- 确保新代码与主题的整体性和一致性
-"""
+def _write_if_changed(dest_file: str, content: bytes) -> bool:
+    """目标文件内容不同时才写入，返回是否发生写入"""
+    if os.path.isfile(dest_file) and os.path.getsize(dest_file) == len(content):
+        if _file_digest(dest_file) == hashlib.sha256(content).hexdigest():
+            return False
+    
+    with open(dest_file, 'wb') as f:
+        f.write(content)
+    return True
 
-    content = f"""# iOS 代码改造规范
+def _copy_if_changed(source_file: str, dest_file: str) -> bool:
+    """目标文件内容与源文件不同时才复制，返回是否发生复制"""
+    if os.path.isfile(dest_file) and os.path.getsize(dest_file) == os.path.getsize(source_file):
+        if _file_digest(dest_file) == _file_digest(source_file):
+            return False
+    
+    shutil.copy2(source_file, dest_file)
+    return True
 
-## 项目基本信息
-- 应用主题: {app_theme if app_theme else "未指定"}
-{theme_guidance}
-## 核心改造原则
+# iOS代码规范中与主题无关的静态部分，模块加载时预先构建
+_IOS_RULES_STATIC_BODY = """## 核心改造原则
 
 ### 1. 功能逻辑不变原则
 - **严格保持**: 原有代码的所有功能逻辑必须完全保持不变
@@ -591,6 +1053,36 @@ ios_get_progress_statistics(project_path)
 - 任何改造都不能影响原有的功能逻辑
 - 完成改造后务必调用MCP工具更新进度记录
 """
+
+def _generate_ios_rules(project_path: str, app_theme: str = "") -> str:
+    """动态生成iOS代码规范文件内容，结合App主题生成相关规则"""
+    return _render_ios_rules(app_theme, IOS_RULES_TEMPLATE_VERSION)
+
+@lru_cache(maxsize=32)
+def _render_ios_rules(app_theme: str, template_version: str) -> str:
+    """渲染iOS代码规范模板（按主题和模板版本缓存）"""
+    
+    # 生成主题提示
+    theme_guidance = ""
+    if app_theme:
+        theme_guidance = f"""
+## 主题导向改造指引
+
+**应用主题**: {app_theme}
+
+**代码生成要求**:
+- 所有新增代码应围绕"{app_theme}"主题进行设计
+- 新增功能、类名、方法名应与主题相关
+- 生成的业务逻辑应符合应用的特点
+- 确保新代码与主题的整体性和一致性
+"""
+
+    content = f"""# iOS 代码改造规范
+
+## 项目基本信息
+- 应用主题: {app_theme if app_theme else "未指定"}
+{theme_guidance}
+""" + _IOS_RULES_STATIC_BODY
     
     return content
 
@@ -0,0 +1,66 @@
+"""
+文件分析结果缓存
+按文件路径和分析阶段组合缓存分析结果，文件的修改时间或大小变化后自动失效
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+
+class AnalysisCache:
+    """线程安全的LRU分析结果缓存"""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, tuple], Tuple[Tuple[int, int], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(file_path: str) -> Optional[Tuple[int, int]]:
+        """返回文件的(修改时间, 大小)，文件不存在时返回None"""
+        try:
+            st = os.stat(file_path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def get(self, file_path: str, fingerprint: Optional[Tuple[int, int]], variant: tuple = ()) -> Optional[Dict[str, Any]]:
+        """获取未过期的缓存结果，variant区分不同的分析阶段组合"""
+        if fingerprint is None:
+            return None
+
+        key = (os.path.abspath(file_path), variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, file_path: str, fingerprint: Optional[Tuple[int, int]], analysis: Dict[str, Any], variant: tuple = ()):
+        """写入缓存（分析失败的结果不缓存）"""
+        if fingerprint is None or 'error' in analysis:
+            return
+
+        key = (os.path.abspath(file_path), variant)
+        with self._lock:
+            self._entries[key] = (fingerprint, dict(analysis))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -0,0 +1,292 @@
+"""
+可插拔的单遍分析流水线
+各分析阶段注册到同一次按行分块的遍历上：基于正则的阶段合并为一个交替正则，每块只扫描一次并按匹配分发，
+基于关键词的阶段共享每块的小写文本做子串查找，新增检查不再额外遍历文件
+"""
+
+import re
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, Type
+
+
+class LineChunk:
+    """一组连续的行，拼接文本和小写文本在首次使用时计算并在各阶段间共享"""
+
+    __slots__ = ('lines', '_text', '_lower')
+
+    def __init__(self, lines: List[str], text: Optional[str] = None):
+        self.lines = lines
+        self._text = text
+        self._lower = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = '\n'.join(self.lines)
+        return self._text
+
+    @property
+    def lower(self) -> str:
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+
+class AnalyzerStage:
+    """
+    分析阶段基类
+
+    每个文件创建一个阶段实例，按顺序接收文件的所有分块，最后返回要合并进文件记录的字段。
+    声明了 PATTERN 的阶段不再自己扫描分块，由流水线把本块命中的匹配类型按顺序传给 on_matches；
+    其余阶段通过 feed 接收整块
+    """
+
+    name = ''
+
+    # 按 re.MULTILINE 编译的正则，每个分支放在一个命名分组中，分组名即匹配类型（不能含其他捕获组和反向引用）
+    PATTERN = ''
+
+    def feed(self, chunk: LineChunk):
+        raise NotImplementedError
+
+    def on_matches(self, kinds: List[str]):
+        raise NotImplementedError
+
+    def result(self, line_count: int) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+# 已注册的分析阶段
+STAGE_REGISTRY: Dict[str, Type[AnalyzerStage]] = {}
+
+
+def register_stage(stage_class: Type[AnalyzerStage]) -> Type[AnalyzerStage]:
+    """注册分析阶段（可用作类装饰器）"""
+    if not stage_class.name:
+        raise ValueError(f"分析阶段缺少名称: {stage_class.__name__}")
+    STAGE_REGISTRY[stage_class.name] = stage_class
+    return stage_class
+
+
+@register_stage
+class SensitiveKeywordStage(AnalyzerStage):
+    """敏感关键词检测"""
+
+    name = 'sensitive'
+
+    KEYWORDS = [
+        'payment', 'purchase', 'webview', 'javascript', 'js', 'pay', 'in-app'
+    ]
+
+    def __init__(self):
+        self.found = False
+
+    def feed(self, chunk: LineChunk):
+        if not self.found:
+            lower = chunk.lower
+            self.found = any(keyword in lower for keyword in self.KEYWORDS)
+
+    def result(self, line_count: int) -> Dict[str, Any]:
+        return {'has_sensitive_content': self.found}
+
+
+@register_stage
+class DeclarationStage(AnalyzerStage):
+    """类型、扩展和方法声明计数（Swift / Objective-C）"""
+
+    name = 'declarations'
+
+    # 所有分支共享行首锚点，行首不匹配时整个分支组立即失败
+    PATTERN = (
+        r'^[ \t]*(?:(?P<objc_method>[-+])[ \t]*\(|@(?P<objc_type>interface|implementation|protocol)\b|'
+        r'(?:@\w+[ \t]+)*(?:(?:public|private|fileprivate|internal|open|final|static|class|override|'
+        r'mutating|convenience|required)[ \t]+)*'
+        r'(?:(?P<function>func)|(?P<extension>extension)|(?P<type>class|struct|enum|protocol))[ \t])'
+    )
+
+    def __init__(self):
+        self.types = 0
+        self.extensions = 0
+        self.functions = 0
+
+    def on_matches(self, kinds: List[str]):
+        for kind in kinds:
+            if kind in ('function', 'objc_method'):
+                self.functions += 1
+            elif kind == 'extension':
+                self.extensions += 1
+            else:
+                self.types += 1
+
+    def result(self, line_count: int) -> Dict[str, Any]:
+        return {
+            'declarations': {
+                'types': self.types,
+                'extensions': self.extensions,
+                'functions': self.functions
+            }
+        }
+
+
+@register_stage
+class ComplexityStage(AnalyzerStage):
+    """基于分支关键字的复杂度估算"""
+
+    name = 'complexity'
+
+    PATTERN = r'(?P<decision>\b(?:if|for|while|case|guard|catch|repeat)\b|&&|\|\||\?\?)'
+
+    def __init__(self):
+        self.decision_points = 0
+
+    def on_matches(self, kinds: List[str]):
+        self.decision_points += len(kinds)
+
+    def result(self, line_count: int) -> Dict[str, Any]:
+        return {
+            'complexity': {
+                'decision_points': self.decision_points,
+                'per_100_lines': round(self.decision_points / line_count * 100, 2) if line_count else 0
+            }
+        }
+
+
+@register_stage
+class ApiUsageStage(AnalyzerStage):
+    """系统框架和常用API使用检测"""
+
+    name = 'api_usage'
+
+    API_MARKERS = {
+        'UIKit': ['uikit', 'uiview', 'uilabel', 'uicolor'],
+        'Foundation': ['foundation', 'nsstring', 'nsarray', 'nsdictionary', 'userdefaults', 'date()'],
+        'GCD': ['dispatchqueue', 'dispatch_async', 'dispatch_get_main_queue', 'dispatchgroup'],
+        'NotificationCenter': ['notificationcenter'],
+        'URLSession': ['urlsession'],
+        'CoreGraphics': ['coregraphics', 'cgcontext', 'uibezierpath', 'cgrect']
+    }
+
+    def __init__(self):
+        self.found = set()
+
+    def feed(self, chunk: LineChunk):
+        lower = chunk.lower
+        for api, markers in self.API_MARKERS.items():
+            if api not in self.found and any(marker in lower for marker in markers):
+                self.found.add(api)
+
+    def result(self, line_count: int) -> Dict[str, Any]:
+        return {'api_usage': sorted(self.found)}
+
+
+class AnalyzerPipeline:
+    """按固定阶段组合执行单遍分析，并累计每个阶段的耗时"""
+
+    # 每次送入各阶段的行数，大多数文件只有一块
+    CHUNK_LINES = 512
+
+    DEFAULT_STAGES = ('sensitive',)
+
+    # 合并正则扫描的耗时单独统计，各正则阶段的耗时只包含处理分发给它的匹配
+    SHARED_SCAN = 'shared_scan'
+
+    def __init__(self, stages: Optional[List[str]] = None):
+        self.stage_names = self.resolve_stages(stages)
+        self.stage_classes = [STAGE_REGISTRY[name] for name in self.stage_names]
+        self.pattern, self._dispatch = self._combine_patterns(self.stage_classes)
+        self._lock = threading.Lock()
+        self._stats = {name: {'files': 0, 'total_ms': 0.0} for name in self.stage_names}
+        if self.pattern is not None:
+            self._stats[self.SHARED_SCAN] = {'files': 0, 'total_ms': 0.0}
+
+    @classmethod
+    def resolve_stages(cls, stages: Optional[List[str]]) -> Tuple[str, ...]:
+        """校验阶段名称并返回规范化的阶段组合：默认阶段总是启用，其余按注册顺序排列并去重"""
+        for name in stages or []:
+            if name not in STAGE_REGISTRY:
+                raise ValueError(f"未知的分析阶段: {name}，可选: {', '.join(sorted(STAGE_REGISTRY))}")
+        requested = set(stages or [])
+        return tuple(cls.DEFAULT_STAGES) + tuple(
+            name for name in STAGE_REGISTRY if name in requested and name not in cls.DEFAULT_STAGES
+        )
+
+    @staticmethod
+    def _combine_patterns(stage_classes: List[Type[AnalyzerStage]]):
+        """将各阶段的正则合并为一个交替正则，返回(正则, 分组名 -> (阶段序号, 匹配类型))"""
+        alternatives = []
+        dispatch = {}
+        for index, stage_class in enumerate(stage_classes):
+            if not stage_class.PATTERN:
+                continue
+
+            def rename(match, index=index):
+                # 分组名加上阶段序号，避免不同阶段的匹配类型重名
+                group = f"s{index}_{match.group(1)}"
+                dispatch[group] = (index, match.group(1))
+                return f"(?P<{group}>"
+
+            alternatives.append(re.sub(r'\(\?P<(\w+)>', rename, stage_class.PATTERN))
+
+        if not alternatives:
+            return None, dispatch
+        return re.compile('|'.join(alternatives), re.MULTILINE), dispatch
+
+    def run(self, content: str) -> Tuple[int, Dict[str, Any]]:
+        """对文件内容执行一次遍历，返回(行数, 各阶段合并后的结果)"""
+        lines = content.split('\n')
+        line_count = len(lines)
+        stages = [stage_class() for stage_class in self.stage_classes]
+        pattern_stages = [index for index, stage_class in enumerate(self.stage_classes) if stage_class.PATTERN]
+        feed_stages = [index for index, stage_class in enumerate(self.stage_classes) if not stage_class.PATTERN]
+        elapsed = [0.0] * len(stages)
+        shared_scan = 0.0
+
+        if line_count <= self.CHUNK_LINES:
+            chunks = [LineChunk(lines, content)]
+        else:
+            chunks = (LineChunk(lines[i:i + self.CHUNK_LINES]) for i in range(0, line_count, self.CHUNK_LINES))
+
+        for chunk in chunks:
+            if self.pattern is not None:
+                # 每块只扫描一次，按命中的分组把匹配类型分发给对应阶段
+                start = time.perf_counter()
+                matched: Dict[int, List[str]] = {index: [] for index in pattern_stages}
+                for match in self.pattern.finditer(chunk.text):
+                    index, kind = self._dispatch[match.lastgroup]
+                    matched[index].append(kind)
+                shared_scan += time.perf_counter() - start
+
+                for index in pattern_stages:
+                    start = time.perf_counter()
+                    stages[index].on_matches(matched[index])
+                    elapsed[index] += time.perf_counter() - start
+
+            for index in feed_stages:
+                start = time.perf_counter()
+                stages[index].feed(chunk)
+                elapsed[index] += time.perf_counter() - start
+
+        results = {}
+        for index, stage in enumerate(stages):
+            start = time.perf_counter()
+            results.update(stage.result(line_count))
+            elapsed[index] += time.perf_counter() - start
+
+        with self._lock:
+            for name, seconds in zip(self.stage_names, elapsed):
+                self._stats[name]['files'] += 1
+                self._stats[name]['total_ms'] += seconds * 1000
+            if self.pattern is not None:
+                self._stats[self.SHARED_SCAN]['files'] += 1
+                self._stats[self.SHARED_SCAN]['total_ms'] += shared_scan * 1000
+
+        return line_count, results
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各阶段累计耗时（启用正则阶段时包含合并正则扫描的耗时 shared_scan）"""
+        with self._lock:
+            return {
+                name: {'files': stat['files'], 'total_ms': round(stat['total_ms'], 3)}
+                for name, stat in self._stats.items()
+            }
@@ -0,0 +1,139 @@
+"""
+文件内容基线快照
+扫描时记录每个文件的内容指纹，之后并行比对以自动识别被改造过的文件
+"""
+
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from .resource_governor import ResourceGovernor
+from .record_store import record_lock, write_json_atomic
+
+
+class ContentSnapshot:
+    """基线快照管理器"""
+
+    SNAPSHOT_FILE = 'baseline_snapshot.json'
+    HASH_ALGORITHM = 'blake2b-128'
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+
+    @staticmethod
+    def hash_file(file_path: str, governor: Optional[ResourceGovernor] = None) -> Optional[List]:
+        """计算文件指纹 [大小, 修改时间, 内容哈希]，读取失败返回None"""
+        try:
+            st = os.stat(file_path)
+            digest = hashlib.blake2b(digest_size=16)
+            if governor is not None:
+                digest.update(governor.read_bytes(file_path))
+            else:
+                with open(file_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(chunk)
+            return [st.st_size, st.st_mtime_ns, digest.hexdigest()]
+        except OSError:
+            return None
+
+    def _hash_many(self, file_paths: List[str], governor: Optional[ResourceGovernor] = None) -> List[Optional[List]]:
+        if governor is not None:
+            with ThreadPoolExecutor(max_workers=governor.max_workers, initializer=governor.init_worker) as executor:
+                return list(executor.map(lambda p: self.hash_file(p, governor), file_paths))
+        if len(file_paths) <= 1:
+            return [self.hash_file(p) for p in file_paths]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(file_paths))) as executor:
+            return list(executor.map(self.hash_file, file_paths, chunksize=64))
+
+    def snapshot_path(self, project_path: str) -> str:
+        return os.path.join(project_path, '.record', self.SNAPSHOT_FILE)
+
+    def has_baseline(self, project_path: str) -> bool:
+        return os.path.exists(self.snapshot_path(project_path))
+
+    def load_baseline(self, project_path: str) -> Dict[str, Any]:
+        with open(self.snapshot_path(project_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def create_baseline(self, project_path: str, file_paths: List[str], include_tests: bool = False,
+                        governor: Optional[ResourceGovernor] = None) -> Dict[str, Any]:
+        """为文件列表创建基线快照并保存"""
+        fingerprints = self._hash_many(file_paths, governor)
+
+        files = {}
+        for file_path, fingerprint in zip(file_paths, fingerprints):
+            if fingerprint is not None:
+                files[os.path.relpath(file_path, project_path)] = fingerprint
+
+        baseline = {
+            "created_at": datetime.now().isoformat(),
+            "hash_algorithm": self.HASH_ALGORITHM,
+            "include_tests": include_tests,
+            "total_files": len(files),
+            "files": files
+        }
+
+        snapshot_file = self.snapshot_path(project_path)
+        with record_lock(os.path.dirname(snapshot_file)):
+            write_json_atomic(snapshot_file, baseline, separators=(',', ':'))
+
+        return {
+            "snapshot_file": snapshot_file,
+            "created_at": baseline["created_at"],
+            "total_files": len(files)
+        }
+
+    def compare(self, project_path: str, file_paths: List[str], verify_content: bool = False) -> Dict[str, Any]:
+        """
+        将当前文件与基线比对
+
+        大小和修改时间都未变化的文件直接视为未改动，只对其余文件并行重新哈希；
+        verify_content为True时对所有文件重新哈希
+        """
+        baseline = self.load_baseline(project_path)
+        baseline_files = baseline.get("files", {})
+
+        current = {os.path.relpath(p, project_path): p for p in file_paths}
+        added = sorted(path for path in current if path not in baseline_files)
+        deleted = sorted(path for path in baseline_files if path not in current)
+
+        untouched = []
+        to_hash = []
+        for rel_path, file_path in current.items():
+            expected = baseline_files.get(rel_path)
+            if expected is None:
+                continue
+            if not verify_content:
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+                if st.st_size == expected[0] and st.st_mtime_ns == expected[1]:
+                    untouched.append(rel_path)
+                    continue
+            to_hash.append(rel_path)
+
+        modified = []
+        for rel_path, fingerprint in zip(to_hash, self._hash_many([current[p] for p in to_hash])):
+            expected = baseline_files[rel_path]
+            if fingerprint is None:
+                continue
+            # 只比较大小和内容，修改时间变化但内容相同视为未改动
+            if fingerprint[0] == expected[0] and fingerprint[2] == expected[2]:
+                untouched.append(rel_path)
+            else:
+                modified.append(rel_path)
+
+        return {
+            "baseline_created_at": baseline.get("created_at"),
+            "hash_algorithm": baseline.get("hash_algorithm"),
+            "files_checked": len(current),
+            "files_hashed": len(to_hash),
+            "modified": sorted(modified),
+            "added": added,
+            "deleted": deleted,
+            "untouched": sorted(untouched)
+        }
@@ -4,27 +4,37 @@
 """
 
 import os
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from .analyzer_pipeline import AnalyzerPipeline, SensitiveKeywordStage
 
 
 class FileAnalyzer:
     """简化的文件分析器 - 只提供基本文件信息"""
     
     # 敏感关键词检测
-    SENSITIVE_KEYWORDS = [
-        'payment', 'purchase', 'webview', 'javascript', 'js', 'pay', 'in-app'
-    ]
+    SENSITIVE_KEYWORDS = SensitiveKeywordStage.KEYWORDS
+    
+    def __init__(self):
+        self._pipelines: Dict[Tuple[str, ...], AnalyzerPipeline] = {}
+        self._pipelines_lock = threading.Lock()
+    
+    def get_pipeline(self, stages: Optional[List[str]] = None) -> AnalyzerPipeline:
+        """获取指定阶段组合的分析流水线（同一组合复用同一实例以累计耗时）"""
+        key = AnalyzerPipeline.resolve_stages(stages)
+        with self._pipelines_lock:
+            if key not in self._pipelines:
+                self._pipelines[key] = AnalyzerPipeline(list(key))
+            return self._pipelines[key]
     
-    def analyze_file(self, file_path: str, content: str) -> Dict[str, Any]:
+    def analyze_file(self, file_path: str, content: str, stages: Optional[List[str]] = None) -> Dict[str, Any]:
         """
-        简化的文件分析 - 只返回基本信息
+        简化的文件分析 - 返回基本信息，以及启用的附加分析阶段结果
         """
         try:
-            lines = content.split('\n')
-            line_count = len(lines)
-            
-            # 检测敏感关键词
-            has_sensitive = self._check_sensitive_keywords(content.lower())
+            line_count, stage_results = self.get_pipeline(stages).run(content)
+            has_sensitive = stage_results.pop('has_sensitive_content')
             
             # 基本文件信息
             result = {
@@ -34,6 +44,7 @@ class FileAnalyzer:
                 'file_size': 'small' if line_count < 100 else 'medium' if line_count < 300 else 'large',
                 'ready_for_transformation': not has_sensitive
             }
+            result.update(stage_results)
             
             return result
             
@@ -46,7 +57,3 @@ class FileAnalyzer:
                 'ready_for_transformation': False,
                 'error': str(e)
             }
-    
-    def _check_sensitive_keywords(self, content: str) -> bool:
-        """检查是否包含敏感关键词"""
-        return any(keyword in content for keyword in self.SENSITIVE_KEYWORDS)
\ No newline at end of file
@@ -4,10 +4,15 @@
 """
 
 import os
-import json
+import sys
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
 from .file_analyzer import FileAnalyzer
+from .analyzer_pipeline import AnalyzerPipeline
+from .analysis_cache import AnalysisCache
+from .resource_governor import ResourceGovernor
+from .record_store import record_lock, write_json_atomic
 
 
 class ProjectScanner:
@@ -16,15 +21,29 @@ class ProjectScanner:
     # 支持的文件扩展名
     SUPPORTED_EXTENSIONS = ['.swift', '.m', '.h', '.mm', '.cpp', '.cc', '.c']
     
+    # 跳过的非代码目录
+    EXCLUDED_DIRECTORIES = ['Pods', 'build', 'DerivedData', 'Carthage']
+    
+    # 测试目录匹配模式
+    TEST_DIRECTORY_PATTERNS = ['tests', 'testing', 'unittest', 'uitest']
+    
     def __init__(self):
         self.file_analyzer = FileAnalyzer()
+        self.analysis_cache = AnalysisCache()
         
-    def scan_project(self, project_path: str, include_tests: bool = False) -> Dict[str, Any]:
+    def scan_project(self, project_path: str, include_tests: bool = False, stages: Optional[List[str]] = None,
+                     governor: Optional[ResourceGovernor] = None) -> Dict[str, Any]:
         """
         扫描项目，返回简化的结果
+        
+        stages 为额外启用的分析阶段，在同一次遍历中执行并合并到文件记录；
+        governor 不为空时在其资源限制下用低优先级工作线程分析文件
         """
         try:
-            print(f"🔍 开始扫描项目: {project_path}")
+            pipeline = self.file_analyzer.get_pipeline(stages)
+            stats_before = pipeline.stats()
+            
+            print(f"🔍 开始扫描项目: {project_path}", file=sys.stderr)
             
             # 查找代码文件
             code_files = self._find_code_files(project_path, include_tests)
@@ -38,28 +57,13 @@ class ProjectScanner:
                 }
             
             # 分析文件
-            analyzed_files = []
-            total_lines = 0
-            
-            for file_path in code_files:
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    analysis = self.file_analyzer.analyze_file(file_path, content)
-                    analyzed_files.append(analysis)
-                    total_lines += analysis.get('line_count', 0)
-                    
-                except Exception as e:
-                    print(f"⚠️  分析文件失败: {file_path} - {e}")
-                    analyzed_files.append({
-                        'path': os.path.relpath(file_path),
-                        'line_count': 0,
-                        'has_sensitive_content': True,
-                        'file_size': 'unknown',
-                        'ready_for_transformation': False,
-                        'error': str(e)
-                    })
+            if governor is not None:
+                with ThreadPoolExecutor(max_workers=governor.max_workers, initializer=governor.init_worker) as executor:
+                    analyzed_files = list(executor.map(lambda file_path: self.analyze_path(file_path, stages, governor), code_files))
+            else:
+                analyzed_files = [self.analyze_path(file_path, stages) for file_path in code_files]
+            
+            total_lines = sum(analysis.get('line_count', 0) for analysis in analyzed_files)
             
             # 创建扫描结果
             result = {
@@ -70,14 +74,20 @@ class ProjectScanner:
                 "scan_timestamp": datetime.now().isoformat()
             }
             
+            if stages:
+                result["analyzer_stages"] = self._stage_timings(stats_before, pipeline.stats())
+            
+            if governor is not None:
+                result["resource_limits"] = governor.report()
+            
             # 保存扫描记录
-            self._save_scan_record(project_path, result)
+            self.save_scan_record(project_path, result)
             
-            print(f"✅ 扫描完成，找到 {len(analyzed_files)} 个文件")
+            print(f"✅ 扫描完成，找到 {len(analyzed_files)} 个文件", file=sys.stderr)
             return result
             
         except Exception as e:
-            print(f"❌ 扫描项目失败: {e}")
+            print(f"❌ 扫描项目失败: {e}", file=sys.stderr)
             return {
                 "project_path": project_path,
                 "total_files": 0,
@@ -85,31 +95,103 @@ class ProjectScanner:
                 "error": str(e)
             }
     
+    def analyze_path(self, file_path: str, stages: Optional[List[str]] = None,
+                     governor: Optional[ResourceGovernor] = None) -> Dict[str, Any]:
+        """读取并分析单个文件（文件未变化时复用缓存），读取失败时返回错误记录"""
+        try:
+            # 使用规范化的阶段组合作为缓存键，顺序不同或重复的阶段列表共享缓存
+            variant = AnalyzerPipeline.resolve_stages(stages)
+            fingerprint = self.analysis_cache.fingerprint(file_path)
+            cached = self.analysis_cache.get(file_path, fingerprint, variant)
+            if cached is not None:
+                return cached
+            
+            if governor is not None:
+                content = governor.read_text(file_path)
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            
+            analysis = self.file_analyzer.analyze_file(file_path, content, stages)
+            self.analysis_cache.put(file_path, fingerprint, analysis, variant)
+            return analysis
+            
+        except Exception as e:
+            print(f"⚠️  分析文件失败: {file_path} - {e}", file=sys.stderr)
+            return {
+                'path': os.path.relpath(file_path),
+                'line_count': 0,
+                'has_sensitive_content': True,
+                'file_size': 'unknown',
+                'ready_for_transformation': False,
+                'error': str(e)
+            }
+    
+    def analyze_paths(self, file_paths: List[str], max_workers: int = 8, stages: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """并行读取并分析多个文件，结果顺序与输入一致"""
+        if len(file_paths) <= 1 or max_workers <= 1:
+            return [self.analyze_path(file_path, stages) for file_path in file_paths]
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(file_paths))) as executor:
+            return list(executor.map(lambda file_path: self.analyze_path(file_path, stages), file_paths))
+    
+    @staticmethod
+    def _stage_timings(before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """计算本次扫描中各分析阶段的文件数和耗时"""
+        return {
+            name: {
+                'files': stat['files'] - before.get(name, {}).get('files', 0),
+                'total_ms': round(stat['total_ms'] - before.get(name, {}).get('total_ms', 0.0), 3)
+            }
+            for name, stat in after.items()
+        }
+    
     def _find_code_files(self, project_path: str, include_tests: bool) -> List[str]:
         """查找代码文件"""
         code_files = []
         
-        print(f"📂 扫描目录: {project_path}")
+        print(f"📂 扫描目录: {project_path}", file=sys.stderr)
         
+        for file_path in self.iter_code_files(project_path, include_tests):
+            code_files.append(file_path)
+            print(f"✅ 找到文件: {os.path.relpath(file_path, project_path)}", file=sys.stderr)
+        
+        return code_files
+    
+    def iter_code_files(self, project_path: str, include_tests: bool) -> Iterator[str]:
+        """遍历项目中的代码文件（不输出日志）"""
         for root, dirs, files in os.walk(project_path):
-            # 跳过隐藏目录和非代码目录
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['Pods', 'build', 'DerivedData', 'Carthage']]
-            
-            # 如果不包含测试文件，跳过测试目录
-            if not include_tests:
-                dirs[:] = [d for d in dirs if not any(test_pattern in d.lower() for test_pattern in ['tests', 'testing', 'unittest', 'uitest'])]
+            dirs[:] = [d for d in dirs if self.is_code_directory(d, include_tests)]
             
             for file in files:
-                if any(file.endswith(ext) for ext in self.SUPPORTED_EXTENSIONS):
-                    # 检查是否为测试文件
-                    if not include_tests and self._is_test_file(file):
-                        continue
-                    
-                    file_path = os.path.join(root, file)
-                    code_files.append(file_path)
-                    print(f"✅ 找到文件: {os.path.relpath(file_path, project_path)}")
+                if self.is_code_file(file, include_tests):
+                    yield os.path.join(root, file)
+    
+    def is_code_path(self, relative_path: str, include_tests: bool) -> bool:
+        """判断相对项目根目录的文件路径是否会被扫描（各级目录和文件名都需符合扫描规则）"""
+        parts = relative_path.split(os.sep)
+        return (all(self.is_code_directory(d, include_tests) for d in parts[:-1])
+                and self.is_code_file(parts[-1], include_tests))
+    
+    def is_code_directory(self, dirname: str, include_tests: bool) -> bool:
+        """判断目录是否需要扫描"""
+        # 跳过隐藏目录和非代码目录
+        if dirname.startswith('.') or dirname in self.EXCLUDED_DIRECTORIES:
+            return False
         
-        return code_files
+        # 如果不包含测试文件，跳过测试目录
+        if not include_tests and any(test_pattern in dirname.lower() for test_pattern in self.TEST_DIRECTORY_PATTERNS):
+            return False
+        
+        return True
+    
+    def is_code_file(self, filename: str, include_tests: bool) -> bool:
+        """判断文件是否为需要扫描的代码文件"""
+        if not any(filename.endswith(ext) for ext in self.SUPPORTED_EXTENSIONS):
+            return False
+        
+        # 检查是否为测试文件
+        return include_tests or not self._is_test_file(filename)
     
     def _is_test_file(self, filename: str) -> bool:
         """判断是否为测试文件"""
@@ -117,18 +199,16 @@ class ProjectScanner:
         filename_lower = filename.lower()
         return any(pattern in filename_lower for pattern in test_patterns)
     
-    def _save_scan_record(self, project_path: str, scan_result: Dict[str, Any]):
-        """保存扫描记录（统一命名，覆盖旧文件）"""
+    def save_scan_record(self, project_path: str, scan_result: Dict[str, Any]):
+        """保存扫描记录（统一命名，覆盖旧文件，写入失败只记录日志）"""
         try:
             record_dir = os.path.join(project_path, '.record')
-            os.makedirs(record_dir, exist_ok=True)
-            
             record_file = os.path.join(record_dir, "latest_scan_result.json")
             
-            with open(record_file, 'w', encoding='utf-8') as f:
-                json.dump(scan_result, f, indent=2, ensure_ascii=False)
+            with record_lock(record_dir):
+                write_json_atomic(record_file, scan_result)
             
-            print(f"📄 扫描记录已保存: {record_file}")
+            print(f"📄 扫描记录已保存: {record_file}", file=sys.stderr)
             
         except Exception as e:
-            print(f"⚠️  保存扫描记录失败: {e}") 
\ No newline at end of file
+            print(f"⚠️  保存扫描记录失败: {e}", file=sys.stderr) 
\ No newline at end of file
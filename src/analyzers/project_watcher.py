@@ -0,0 +1,444 @@
+"""
+项目实时监听器
+在后台持续跟踪项目文件变更，增量更新缓存的扫描结果和 .record 记录文件
+"""
+
+import os
+import sys
+import json
+import time
+import errno
+import select
+import struct
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from .project_scanner import ProjectScanner
+from .record_store import record_lock, write_json_atomic
+
+
+class _InotifyBackend:
+    """基于 inotify 的变更来源（仅 Linux 可用）"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                  IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, scanner: ProjectScanner, project_path: str, include_tests: bool, max_watch_dirs: int):
+        import ctypes
+        import ctypes.util
+
+        self.scanner = scanner
+        self.project_path = project_path
+        self.include_tests = include_tests
+        self.max_watch_dirs = max_watch_dirs
+        self.overflowed = False
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._watch_dirs: Dict[int, str] = {}
+
+        try:
+            self._add_tree(project_path)
+        except Exception:
+            self.close()
+            raise
+
+    def _add_tree(self, directory: str) -> List[str]:
+        """为目录树添加监听，返回其中已有的代码文件"""
+        found_files = []
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if self.scanner.is_code_directory(d, self.include_tests)]
+            self._add_watch(root)
+            found_files.extend(os.path.join(root, f) for f in files if self.scanner.is_code_file(f, self.include_tests))
+        return found_files
+
+    def _add_watch(self, directory: str):
+        if len(self._watch_dirs) >= self.max_watch_dirs:
+            raise OSError(errno.ENOSPC, f"监听目录数超过上限 {self.max_watch_dirs}")
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.WATCH_MASK)
+        if wd < 0:
+            import ctypes
+            raise OSError(ctypes.get_errno(), f"无法监听目录: {directory}")
+        self._watch_dirs[wd] = directory
+
+    @property
+    def watch_count(self) -> int:
+        return len(self._watch_dirs)
+
+    def poll(self, timeout: float) -> Set[str]:
+        """等待变更事件，返回发生变化的代码文件路径"""
+        changed: Set[str] = set()
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return changed
+
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            self._parse_events(data, changed)
+
+        return changed
+
+    def _parse_events(self, data: bytes, changed: Set[str]):
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, name_len = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+
+            if mask & self.IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            if mask & self.IN_IGNORED:
+                self._watch_dirs.pop(wd, None)
+                continue
+
+            directory = self._watch_dirs.get(wd)
+            if directory is None or not name:
+                continue
+
+            filename = os.fsdecode(name)
+            path = os.path.join(directory, filename)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO) and self.scanner.is_code_directory(filename, self.include_tests):
+                    try:
+                        changed.update(self._add_tree(path))
+                    except OSError:
+                        self.overflowed = True
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    # 目录被移除时需要全量对账
+                    self.overflowed = True
+            elif self.scanner.is_code_file(filename, self.include_tests):
+                changed.add(path)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._watch_dirs.clear()
+
+
+class _PollingBackend:
+    """基于 stat 批量轮询的变更来源"""
+
+    def __init__(self, scanner: ProjectScanner, project_path: str, include_tests: bool,
+                 interval: float, batch_size: int, max_files: int, stop_event: threading.Event):
+        self.scanner = scanner
+        self.project_path = project_path
+        self.include_tests = include_tests
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_files = max_files
+        self.stop_event = stop_event
+        self.overflowed = False
+        self._stats: Dict[str, Tuple[int, int]] = {}
+
+        for path in scanner.iter_code_files(project_path, include_tests):
+            if len(self._stats) >= max_files:
+                break
+            self._stats[path] = self._stat(path)
+
+    @property
+    def watch_count(self) -> int:
+        return len(self._stats)
+
+    @staticmethod
+    def _stat(path: str) -> Tuple[int, int]:
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return -1, -1
+
+    def poll(self, timeout: float) -> Set[str]:
+        """等待一个轮询周期后分批 stat 所有文件，返回发生变化的路径"""
+        if self.stop_event.wait(max(timeout, self.interval)):
+            return set()
+
+        changed: Set[str] = set()
+        current = set()
+        for index, path in enumerate(self.scanner.iter_code_files(self.project_path, self.include_tests)):
+            # 超出跟踪上限的新文件不再记录，保持内存占用有界
+            if path not in self._stats and len(self._stats) >= self.max_files:
+                continue
+            current.add(path)
+            stat = self._stat(path)
+            if self._stats.get(path) != stat:
+                self._stats[path] = stat
+                changed.add(path)
+            # 每批之间让出 CPU，避免大项目轮询时占满核心
+            if index and index % self.batch_size == 0:
+                if self.stop_event.wait(0.01):
+                    return changed
+
+        for path in set(self._stats) - current:
+            del self._stats[path]
+            changed.add(path)
+
+        return changed
+
+    def close(self):
+        self._stats.clear()
+
+
+class ProjectWatcher:
+    """后台项目监听器，保持扫描结果与磁盘同步"""
+
+    def __init__(self, scanner: ProjectScanner, project_path: str, include_tests: bool = False,
+                 poll_interval: float = 2.0, batch_size: int = 500, max_files: int = 50000,
+                 max_watch_dirs: int = 8192, max_pending: int = 2000, debounce: float = 0.3,
+                 persist_interval: float = 10.0):
+        self.scanner = scanner
+        self.project_path = os.path.abspath(project_path)
+        self.include_tests = include_tests
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_files = max_files
+        self.max_watch_dirs = max_watch_dirs
+        self.max_pending = max_pending
+        self.debounce = debounce
+        self.persist_interval = persist_interval
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._backend = None
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._scan_result: Dict[str, Any] = {}
+        self._truncated = False
+        # 记录文件按最小间隔合并写入，内存中的扫描结果始终最新
+        self._dirty = False
+        self._last_persist = 0.0
+        self._stats = {
+            'started_at': None,
+            'last_update': None,
+            'update_count': 0,
+            'reanalyzed_files': 0,
+            'full_rescans': 0,
+            'persist_count': 0,
+            'last_persist': None,
+            'last_error': None
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def backend_name(self) -> str:
+        if isinstance(self._backend, _InotifyBackend):
+            return 'inotify'
+        if isinstance(self._backend, _PollingBackend):
+            return 'polling'
+        return 'none'
+
+    def start(self):
+        """执行初始扫描并启动后台线程"""
+        if self.running:
+            return
+
+        self._stop_event.clear()
+        # 先建立监听再做初始扫描，扫描期间发生的变更会在第一次轮询时处理
+        self._backend = self._create_backend()
+        try:
+            self._full_rescan()
+            self._persist()
+        except Exception:
+            self._backend.close()
+            self._backend = None
+            raise
+        self._stats['started_at'] = datetime.now().isoformat()
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"ios-watch:{os.path.basename(self.project_path)}",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程并释放监听资源"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(self.poll_interval, 1.0) + 1.0)
+            self._thread = None
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+        if self._dirty:
+            self._persist()
+
+    def _create_backend(self):
+        if sys.platform.startswith('linux'):
+            try:
+                return _InotifyBackend(self.scanner, self.project_path, self.include_tests, self.max_watch_dirs)
+            except (OSError, AttributeError) as e:
+                print(f"⚠️  inotify不可用，改用轮询模式: {e}", file=sys.stderr)
+        return _PollingBackend(self.scanner, self.project_path, self.include_tests,
+                               self.poll_interval, self.batch_size, self.max_files, self._stop_event)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                changed = self._backend.poll(self.poll_interval)
+                if self._stop_event.is_set():
+                    break
+
+                # 合并短时间内的连续写入
+                if changed and isinstance(self._backend, _InotifyBackend) and self.debounce > 0:
+                    deadline = time.monotonic() + self.debounce
+                    while len(changed) <= self.max_pending and time.monotonic() < deadline:
+                        changed |= self._backend.poll(max(0.0, deadline - time.monotonic()))
+
+                if self._backend.overflowed or len(changed) > self.max_pending:
+                    self._backend.overflowed = False
+                    self._full_rescan()
+                elif changed:
+                    self._apply_changes(changed)
+
+                if self._dirty and time.monotonic() - self._last_persist >= self.persist_interval:
+                    self._persist()
+            except Exception as e:
+                self._stats['last_error'] = str(e)
+                print(f"⚠️  监听更新失败: {e}", file=sys.stderr)
+                self._stop_event.wait(self.poll_interval)
+
+    def _full_rescan(self):
+        """全量重新扫描（初始化或事件溢出时使用）"""
+        files = {}
+        truncated = False
+        for path in self.scanner.iter_code_files(self.project_path, self.include_tests):
+            if len(files) >= self.max_files:
+                truncated = True
+                break
+            files[path] = self.scanner.analyze_path(path)
+
+        with self._lock:
+            self._files = files
+            self._truncated = truncated
+            self._stats['full_rescans'] += 1
+            self._stats['reanalyzed_files'] += len(files)
+            self._rebuild_result()
+            self._dirty = True
+
+    def _apply_changes(self, changed: Set[str]):
+        """增量重新分析发生变化的文件"""
+        updates = {}
+        for path in changed:
+            if os.path.isfile(path):
+                updates[path] = self.scanner.analyze_path(path)
+            else:
+                updates[path] = None
+
+        with self._lock:
+            for path, analysis in updates.items():
+                if analysis is None:
+                    self._files.pop(path, None)
+                elif path in self._files or len(self._files) < self.max_files:
+                    self._files[path] = analysis
+                else:
+                    self._truncated = True
+            self._stats['reanalyzed_files'] += sum(1 for a in updates.values() if a is not None)
+            self._rebuild_result()
+            self._dirty = True
+
+    def _rebuild_result(self):
+        files = [self._files[path] for path in sorted(self._files)]
+        self._scan_result = {
+            "project_path": self.project_path,
+            "total_files": len(files),
+            "total_lines": sum(f.get('line_count', 0) for f in files),
+            "files": files,
+            "scan_timestamp": datetime.now().isoformat()
+        }
+        if self._truncated:
+            self._scan_result["truncated"] = True
+        self._stats['last_update'] = self._scan_result["scan_timestamp"]
+        self._stats['update_count'] += 1
+
+    def _persist(self):
+        """同步 latest_scan_result.json 和进度文件中的文件列表"""
+        self._dirty = False
+        self._last_persist = time.monotonic()
+        self._stats['persist_count'] += 1
+        self._stats['last_persist'] = datetime.now().isoformat()
+        scan_result = self.get_scan_result()
+        self.scanner.save_scan_record(self.project_path, scan_result)
+
+        record_dir = os.path.join(self.project_path, '.record')
+        progress_file = os.path.join(record_dir, 'transformation_progress.json')
+        if not os.path.exists(progress_file):
+            return
+
+        try:
+            # 与 ios_update_progress 共用同一把锁，读改写期间不会丢失其他写入
+            with record_lock(record_dir):
+                with open(progress_file, 'r', encoding='utf-8') as f:
+                    progress_data = json.load(f)
+
+                paths = [file_info.get('path') for file_info in scan_result['files']]
+                progress_data.setdefault("project_info", {})["total_files"] = len(paths)
+
+                transformation = progress_data.get("transformation_progress", {})
+                completed = transformation.get("completed")
+                if isinstance(completed, list) and isinstance(transformation.get("not_started"), list):
+                    done = set(completed)
+                    transformation["not_started"] = [p for p in paths if p not in done]
+
+                write_json_atomic(progress_file, progress_data)
+        except Exception as e:
+            print(f"⚠️  同步进度文件失败: {e}", file=sys.stderr)
+
+    def get_scan_result(self) -> Dict[str, Any]:
+        """获取当前缓存的扫描结果"""
+        with self._lock:
+            result = dict(self._scan_result)
+            result["files"] = list(self._scan_result.get("files", []))
+            return result
+
+    def status(self) -> Dict[str, Any]:
+        """获取监听状态"""
+        with self._lock:
+            tracked_files = len(self._files)
+            truncated = self._truncated
+
+        return {
+            "project_path": self.project_path,
+            "running": self.running,
+            "backend": self.backend_name,
+            "include_tests": self.include_tests,
+            "tracked_files": tracked_files,
+            "watch_count": self._backend.watch_count if self._backend is not None else 0,
+            "truncated": truncated,
+            "limits": {
+                "poll_interval": self.poll_interval,
+                "batch_size": self.batch_size,
+                "max_files": self.max_files,
+                "max_watch_dirs": self.max_watch_dirs,
+                "max_pending": self.max_pending,
+                "persist_interval": self.persist_interval
+            },
+            **self._stats
+        }
@@ -0,0 +1,60 @@
+"""
+.record 记录目录读写工具
+所有记录文件的写入都应在同一个项目级锁内进行，并通过临时文件原子替换，
+避免监听线程、工具调用和其他MCP服务进程之间互相覆盖或读到写了一半的文件
+"""
+
+import os
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+LOCK_FILE = '.record.lock'
+
+# flock 在Windows上不可用，进程内再用线程锁兜底
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def record_lock(record_dir: str):
+    """获取项目记录目录的互斥锁（跨线程、跨进程，不可重入）"""
+    os.makedirs(record_dir, exist_ok=True)
+    key = os.path.abspath(record_dir)
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(key, threading.Lock())
+
+    with thread_lock, open(os.path.join(record_dir, LOCK_FILE), 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write(file_path: str, content: str):
+    """写入临时文件后原子替换目标文件"""
+    tmp_file = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_file, file_path)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def write_json_atomic(file_path: str, data: Any, **dump_kwargs):
+    """以JSON格式原子写入文件，默认缩进2且保留中文"""
+    dump_kwargs.setdefault('ensure_ascii', False)
+    if 'separators' not in dump_kwargs:
+        dump_kwargs.setdefault('indent', 2)
+    atomic_write(file_path, json.dumps(data, **dump_kwargs))
@@ -0,0 +1,174 @@
+"""
+扫描资源限制
+限制扫描的并发工作线程数、同时打开的文件数和读取速率，并降低扫描线程的CPU/IO优先级，
+避免在共享构建机上与Xcode编译等任务争抢资源
+"""
+
+import os
+import sys
+import time
+import platform
+import threading
+from typing import Dict, Any, Optional
+
+
+class TokenBucket:
+    """按字节计量的令牌桶限速器"""
+
+    def __init__(self, rate: int, capacity: Optional[int] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.total_wait = 0.0
+
+    def consume(self, amount: int):
+        """消耗令牌，不足时阻塞等待（允许透支，之后的请求按欠额顺延）"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.total_wait += wait
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ResourceGovernor:
+    """扫描资源限制器"""
+
+    READ_CHUNK_SIZE = 64 * 1024
+
+    # ioprio_set 系统调用号（Linux）
+    IOPRIO_SYSCALLS = {'x86_64': 251, 'aarch64': 30, 'i686': 289, 'armv7l': 314}
+    IOPRIO_WHO_PROCESS = 1
+    IOPRIO_CLASS_BE = 2
+    IOPRIO_CLASS_SHIFT = 13
+
+    # macOS 后台QoS
+    QOS_CLASS_BACKGROUND = 0x09
+
+    def __init__(self, max_workers: int = 2, max_open_files: int = 4,
+                 max_read_bytes_per_sec: int = 8 * 1024 * 1024, low_priority: bool = True,
+                 nice_increment: int = 10):
+        self.max_workers = max(1, max_workers)
+        self.max_open_files = max(1, max_open_files)
+        self.max_read_bytes_per_sec = max_read_bytes_per_sec
+        self.low_priority = low_priority
+        self.nice_increment = nice_increment
+
+        self._open_files = threading.BoundedSemaphore(self.max_open_files)
+        # 突发量不超过1秒的配额；每次读取的块不大于桶容量，低速率下也不会一次透支整块
+        self._bucket = TokenBucket(max_read_bytes_per_sec) if max_read_bytes_per_sec > 0 else None
+        self._chunk_size = min(self.READ_CHUNK_SIZE, max_read_bytes_per_sec) if self._bucket else self.READ_CHUNK_SIZE
+
+        self._lock = threading.Lock()
+        self._active_open = 0
+        self._peak_open = 0
+        self._bytes_read = 0
+        self._started = time.monotonic()
+        self._priority: Dict[str, str] = {'cpu': 'unchanged', 'io': 'unchanged'}
+
+    def init_worker(self):
+        """工作线程初始化：只降低当前线程的优先级，不影响MCP服务主线程"""
+        if not self.low_priority:
+            return
+
+        cpu, io = self._lower_thread_priority()
+        with self._lock:
+            self._priority = {'cpu': cpu, 'io': io}
+
+    def _lower_thread_priority(self):
+        cpu = io = 'unsupported'
+
+        if sys.platform.startswith('linux'):
+            tid = threading.get_native_id()
+            # Linux上nice值按线程生效
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, os.getpriority(os.PRIO_PROCESS, tid) + self.nice_increment)
+                cpu = f"nice +{self.nice_increment}"
+            except OSError as e:
+                cpu = f"failed: {e}"
+
+            syscall_nr = self.IOPRIO_SYSCALLS.get(platform.machine())
+            if syscall_nr is not None:
+                try:
+                    import ctypes
+                    libc = ctypes.CDLL(None, use_errno=True)
+                    ioprio = (self.IOPRIO_CLASS_BE << self.IOPRIO_CLASS_SHIFT) | 7
+                    if libc.syscall(syscall_nr, self.IOPRIO_WHO_PROCESS, tid, ioprio) == 0:
+                        io = "best-effort 7"
+                    else:
+                        io = f"failed: errno {ctypes.get_errno()}"
+                except (OSError, AttributeError) as e:
+                    io = f"failed: {e}"
+
+        elif sys.platform == 'darwin':
+            # 后台QoS同时降低线程的CPU调度和磁盘IO优先级
+            try:
+                import ctypes
+                libc = ctypes.CDLL(None)
+                if libc.pthread_set_qos_class_self_np(self.QOS_CLASS_BACKGROUND, 0) == 0:
+                    cpu = io = "qos background"
+                else:
+                    cpu = io = "failed"
+            except (OSError, AttributeError) as e:
+                cpu = io = f"failed: {e}"
+
+        return cpu, io
+
+    def read_text(self, file_path: str, encoding: str = 'utf-8') -> str:
+        """在打开文件数和读取速率限制下读取文件文本"""
+        # 与文本模式读取一致，统一换行符
+        return self.read_bytes(file_path).decode(encoding).replace('\r\n', '\n').replace('\r', '\n')
+
+    def read_bytes(self, file_path: str) -> bytes:
+        """在打开文件数和读取速率限制下读取文件内容"""
+        with self._open_files:
+            with self._lock:
+                self._active_open += 1
+                self._peak_open = max(self._peak_open, self._active_open)
+            try:
+                chunks = []
+                with open(file_path, 'rb') as f:
+                    while True:
+                        chunk = f.read(self._chunk_size)
+                        if not chunk:
+                            break
+                        if self._bucket is not None:
+                            self._bucket.consume(len(chunk))
+                        chunks.append(chunk)
+                data = b''.join(chunks)
+            finally:
+                with self._lock:
+                    self._active_open -= 1
+
+        with self._lock:
+            self._bytes_read += len(data)
+        return data
+
+    def report(self) -> Dict[str, Any]:
+        """返回配置的限制和实际资源使用情况"""
+        elapsed = time.monotonic() - self._started
+        with self._lock:
+            return {
+                "limits": {
+                    "max_workers": self.max_workers,
+                    "max_open_files": self.max_open_files,
+                    "max_read_bytes_per_sec": self.max_read_bytes_per_sec,
+                    "read_burst_bytes": self._bucket.capacity if self._bucket else 0,
+                    "low_priority": self.low_priority
+                },
+                "priority": dict(self._priority),
+                "usage": {
+                    "bytes_read": self._bytes_read,
+                    "peak_open_files": self._peak_open,
+                    # 各线程限速等待时间之和
+                    "throttled_thread_seconds": round(self._bucket.total_wait, 3) if self._bucket else 0.0,
+                    "elapsed_seconds": round(elapsed, 3),
+                    "read_bytes_per_sec": int(self._bytes_read / elapsed) if elapsed > 0 else 0
+                }
+            }
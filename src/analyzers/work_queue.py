@@ -0,0 +1,224 @@
+"""
+改造工作队列
+基于最新扫描结果和改造进度，为未完成的文件维护优先级索引，并支持租约认领
+"""
+
+import os
+import json
+import time
+import heapq
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from .record_store import record_lock, write_json_atomic
+
+
+class WorkQueue:
+    """单个项目的优先级工作队列"""
+
+    # 支持的排序键，前缀 "-" 表示降序
+    RANKING_KEYS = ['sensitive', 'size', 'lines', 'directory', 'path']
+    DEFAULT_RANKING = ['sensitive', 'size', 'lines']
+
+    SIZE_ORDER = {'small': 0, 'medium': 1, 'large': 2}
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        self.record_dir = os.path.join(project_path, '.record')
+        self.scan_file = os.path.join(self.record_dir, 'latest_scan_result.json')
+        self.progress_file = os.path.join(self.record_dir, 'transformation_progress.json')
+        self.queue_file = os.path.join(self.record_dir, 'work_queue.json')
+
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[tuple, str]] = []
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._signature = None
+
+    @classmethod
+    def parse_ranking(cls, ranking: Optional[List[str]]) -> Tuple[str, ...]:
+        """校验排序键配置"""
+        ranking = ranking or cls.DEFAULT_RANKING
+        for key in ranking:
+            if key.lstrip('-') not in cls.RANKING_KEYS:
+                raise ValueError(f"不支持的排序键: {key}，可选: {', '.join(cls.RANKING_KEYS)}")
+        return tuple(ranking)
+
+    def _sort_key(self, file_info: Dict[str, Any], ranking: Tuple[str, ...]) -> tuple:
+        path = file_info.get('path', '')
+        values = {
+            'sensitive': 1 if file_info.get('has_sensitive_content') else 0,
+            'size': self.SIZE_ORDER.get(file_info.get('file_size'), len(self.SIZE_ORDER)),
+            'lines': file_info.get('line_count', 0),
+            'directory': os.path.dirname(path),
+            'path': path
+        }
+
+        key = []
+        for name in ranking:
+            value = values[name.lstrip('-')]
+            if name.startswith('-'):
+                # 字符串降序通过逐字符取反实现，末尾的结束标记大于任何取反字符，使较长的字符串排在其前缀之前
+                value = -value if isinstance(value, int) else tuple(-ord(c) for c in value) + (1,)
+            key.append(value)
+        key.append(path)
+        return tuple(key)
+
+    @staticmethod
+    def _mtime(path: str) -> int:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _completed_files(self) -> Set[str]:
+        """汇总进度文件中已完成的文件"""
+        if not os.path.exists(self.progress_file):
+            return set()
+
+        with open(self.progress_file, 'r', encoding='utf-8') as f:
+            progress_data = json.load(f)
+
+        completed = set()
+        completed_data = progress_data.get('transformation_progress', {}).get('completed')
+        if isinstance(completed_data, list):
+            completed.update(completed_data)
+        for update in progress_data.get('update_history', []):
+            completed.update(update.get('completed_files', []))
+
+        # 进度中的路径相对项目根目录，统一转为绝对路径比较
+        return {os.path.abspath(os.path.join(self.project_path, path)) for path in completed}
+
+    def _refresh_index(self, ranking: Tuple[str, ...]):
+        """扫描结果、进度或排序配置变化时重建索引"""
+        signature = (self._mtime(self.scan_file), self._mtime(self.progress_file), ranking)
+        if signature == self._signature:
+            return
+
+        if not os.path.exists(self.scan_file):
+            raise FileNotFoundError("扫描记录不存在，请先运行项目扫描")
+
+        with open(self.scan_file, 'r', encoding='utf-8') as f:
+            scan_result = json.load(f)
+
+        completed = self._completed_files()
+        self._files = {}
+        heap = []
+        for file_info in scan_result.get('files', []):
+            path = file_info.get('path')
+            # 扫描记录中的路径相对服务进程的工作目录
+            if not path or os.path.abspath(path) in completed:
+                continue
+            # 队列、租约和返回结果统一使用相对项目根目录的路径，与进度记录一致
+            rel_path = self._relative_path(path)
+            file_info = dict(file_info, path=rel_path)
+            self._files[rel_path] = file_info
+            heap.append((self._sort_key(file_info, ranking), rel_path))
+
+        heapq.heapify(heap)
+        self._heap = heap
+        self._signature = signature
+
+    def _relative_path(self, path: str) -> str:
+        """将绝对路径或相对工作目录的路径转换为相对项目根目录的路径"""
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.project_path))
+
+    def _load_leases(self) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """读取未过期的租约，返回(租约, 文件中的租约总数)"""
+        if not os.path.exists(self.queue_file):
+            return {}, 0
+        with open(self.queue_file, 'r', encoding='utf-8') as f:
+            leases = json.load(f).get('leases', {})
+        now = time.time()
+        return {path: lease for path, lease in leases.items() if lease.get('expires_at', 0) > now}, len(leases)
+
+    def _save_leases(self, leases: Dict[str, Dict[str, Any]], ranking: Tuple[str, ...]):
+        data = {
+            'last_updated': datetime.now().isoformat(),
+            'ranking': list(ranking),
+            'leases': leases
+        }
+        write_json_atomic(self.queue_file, data)
+
+    def next_files(self, count: int = 5, agent_id: str = '', lease_seconds: int = 1800,
+                   ranking: Optional[List[str]] = None, claim: bool = True) -> Dict[str, Any]:
+        """
+        取出优先级最高的count个可用文件
+
+        堆中保留全部未完成文件，每次只弹出需要检查的条目再放回，
+        复杂度为 O((k + 已租约数) log n)。
+        认领（claim为True）时必须提供agent_id；只预览且没有过期租约需要清理时不写入队列文件
+        """
+        ranking = self.parse_ranking(ranking)
+        if claim and not agent_id:
+            raise ValueError("认领文件时必须提供agent_id，仅预览请设置claim=False")
+
+        # 与其他 .record 写入共用项目级锁，跨进程认领时互斥
+        with self._lock, record_lock(self.record_dir):
+            self._refresh_index(ranking)
+            stored, stored_count = self._load_leases()
+            leases = {path: lease for path, lease in stored.items() if path in self._files}
+
+            popped = []
+            selected = []
+            while self._heap and len(selected) < count:
+                entry = heapq.heappop(self._heap)
+                popped.append(entry)
+                lease = leases.get(entry[1])
+                if lease is None or (agent_id and lease.get('agent_id') == agent_id):
+                    selected.append(entry[1])
+
+            for entry in popped:
+                heapq.heappush(self._heap, entry)
+
+            expires_at = time.time() + lease_seconds
+            if claim:
+                for path in selected:
+                    leases[path] = {
+                        'agent_id': agent_id,
+                        'expires_at': expires_at,
+                        'expires': datetime.fromtimestamp(expires_at).isoformat()
+                    }
+            # 有新认领，或清理了过期租约和已完成文件的租约时才写入
+            if (claim and selected) or len(leases) != stored_count:
+                self._save_leases(leases, ranking)
+
+            return {
+                'files': [dict(self._files[path]) for path in selected],
+                'claimed': claim,
+                'agent_id': agent_id,
+                'lease_expires': datetime.fromtimestamp(expires_at).isoformat() if claim and selected else None,
+                'ranking': list(ranking),
+                'pending_files': len(self._files),
+                'leased_files': len(leases)
+            }
+
+    def release(self, files: List[str], agent_id: str = '', force: bool = False) -> Dict[str, Any]:
+        """
+        释放租约（files为空时释放该agent的全部租约）
+
+        只能释放agent_id与认领者一致的租约，force为True时可释放任意agent的租约
+        """
+        # 与其他 .record 写入共用项目级锁，跨进程认领时互斥
+        with self._lock, record_lock(self.record_dir):
+            leases, stored_count = self._load_leases()
+            ranking = self._signature[2] if self._signature else tuple(self.DEFAULT_RANKING)
+            # 传入的路径可以是绝对路径或相对项目根目录的路径
+            files = [self._relative_path(os.path.join(self.project_path, path)) for path in files]
+            targets = files or [path for path, lease in leases.items() if lease.get('agent_id') == agent_id]
+
+            released = []
+            not_owned = []
+            for path in targets:
+                lease = leases.get(path)
+                if lease is None:
+                    continue
+                if force or lease.get('agent_id') == agent_id:
+                    del leases[path]
+                    released.append(path)
+                else:
+                    not_owned.append(path)
+
+            if released or len(leases) != stored_count:
+                self._save_leases(leases, ranking)
+            return {'released': released, 'not_owned': not_owned, 'leased_files': len(leases)}